@@ -1,39 +1,79 @@
 import re
-from difflib import SequenceMatcher
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, FrozenSet, Iterable, Iterator, Literal
+
+from rapidfuzz import fuzz
 
 _PUNCT_END = re.compile(r"[.!?…]$")
-_SMALL_WORD = re.compile(
-    r"^(a|an|the|and|or|but|to|of|in|on|at|for|with|your|my|his|her|their|our|is|am|are|was|were|it|that|this|there|here)\b",
-    re.I,
+_SMALL_WORDS = frozenset(
+    "a an the and or but to of in on at for with your my his her their our "
+    "is am are was were it that this there here".split()
 )
+_RE_WS = re.compile(r"\s+")
+_RE_NONWORD = re.compile(r"[^\w\s']")
+_RE_PUNCT_SP = re.compile(r"\s+([,.;:!?])")
+_RE_OPEN = re.compile(r"([(\[{])\s+")
+_RE_CLOSE = re.compile(r"\s+([)\]}])")
 
 
 def format_timestamp(seconds: float) -> str:
     """Convert seconds to SRT timestamp format (HH:MM:SS,mmm)."""
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    milliseconds = int((seconds % 1) * 1000)
+    milliseconds = int(seconds * 1000 + 0.5)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    minutes, secs = divmod(secs, 60)
+    hours, minutes = divmod(minutes, 60)
 
     return f"{hours:02d}:{minutes:02d}:{secs:02d},{milliseconds:03d}"
 
 
 def format_timestamp_vtt(seconds: float) -> str:
     """Convert seconds to VTT timestamp format (HH:MM:SS.mmm)."""
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    milliseconds = int((seconds % 1) * 1000)
+    milliseconds = int(seconds * 1000 + 0.5)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    minutes, secs = divmod(secs, 60)
+    hours, minutes = divmod(minutes, 60)
 
     return f"{hours:02d}:{minutes:02d}:{secs:02d}.{milliseconds:03d}"
 
 
+def iter_format_subtitles(
+    segments: Iterable[Dict[str, Any]],
+    format: Literal["srt", "vtt", "txt"] = "srt",
+) -> Iterator[str]:
+    """Yield processed segments as SRT, VTT, or TXT, one block at a time."""
+    if format == "srt":
+        for i, seg in enumerate(segments, 1):
+            start = format_timestamp(seg["start"])
+            end = format_timestamp(seg["end"])
+            text = seg["text"].strip()
+            yield f"{i}\n{start} --> {end}\n{text}\n\n"
+
+    elif format == "vtt":
+        yield "WEBVTT\n\n"
+        for seg in segments:
+            start = format_timestamp_vtt(seg["start"])
+            end = format_timestamp_vtt(seg["end"])
+            text = seg["text"].strip()
+            yield f"{start} --> {end}\n{text}\n\n"
+
+    else:  # txt
+        for i, seg in enumerate(segments):
+            yield ("\n" if i else "") + seg["text"].strip()
+
+
 def _norm_text(s: str) -> str:
-    s = s.strip().lower()
-    s = re.sub(r"[^\w\s']", " ", s)
-    s = re.sub(r"\s+", " ", s)
-    return s
+    s = _RE_NONWORD.sub(" ", s.lower())
+    return " ".join(s.split())
+
+
+def _starts_with_small_word(text: str) -> bool:
+    # Leading run of word characters, like the old ^(...)\b regex. Small
+    # words are at most 5 letters, so 6 characters is enough to decide.
+    end = 0
+    for ch in text[:6]:
+        if not (ch.isalnum() or ch == "_"):
+            break
+        end += 1
+    return text[:end].lower() in _SMALL_WORDS
 
 
 def _cps(text: str, duration_s: float) -> float:
@@ -41,115 +81,169 @@ def _cps(text: str, duration_s: float) -> float:
     return chars / max(duration_s, 1e-6)
 
 
-def _light_grammar(text: str, prev_ended_sentence: bool) -> str:
-    t = re.sub(r"\s+", " ", text.strip())
-    t = re.sub(r"\s+([,.;:!?])", r"\1", t)
-    t = re.sub(r"([(\[{])\s+", r"\1", t)
-    t = re.sub(r"\s+([)\]}])", r"\1", t)
-    t = t.replace(" i ", " I ")
-    t = re.sub(r"^i\b", "I", t)
+def _light_grammar_tokens(text: str, prev_ended_sentence: bool) -> List[str]:
+    t = _RE_WS.sub(" ", text.strip())
+    t = _RE_PUNCT_SP.sub(r"\1", t)
+    t = _RE_OPEN.sub(r"\1", t)
+    t = _RE_CLOSE.sub(r"\1", t)
+    if " i " in t:
+        t = t.replace(" i ", " I ")
+    # Leading standalone "i" (also "i'm", "i,"), without a regex
+    if t[:1] == "i" and (len(t) == 1 or not (t[1].isalnum() or t[1] == "_")):
+        t = "I" + t[1:]
     if prev_ended_sentence and t and t[0].isalpha():
         t = t[0].upper() + t[1:]
-    return t
+    return t.split()
 
 
-def _similarity(a: str, b: str) -> float:
-    return SequenceMatcher(None, a, b).ratio()
+def _similarity(a: str, b: str, threshold: float = 0.0) -> float:
+    if a == b:
+        return 1.0
+    la, lb = len(a), len(b)
+    if la == 0 or lb == 0:
+        return 0.0
+    # The ratio can never exceed 2*min(len)/(len(a)+len(b))
+    upper = 2 * min(la, lb) / (la + lb)
+    if upper < threshold:
+        return upper
+    # RapidFuzz bails out early (returns 0.0) once the score can't reach threshold
+    return fuzz.ratio(a, b, score_cutoff=threshold * 100) / 100.0
 
 
-def post_process_segments(
-    segments: List[Dict[str, Any]],
-    grammar_style: bool = False,
-    max_chars_per_line: int = 42,
-    min_duration: float = 1.0,
-    max_duration: float = 6.0,
-) -> List[Dict[str, Any]]:
-    """
-    Apply advanced post-processing to subtitles:
-    1. Merge broken sentences.
-    2. Dedupe near-duplicates.
-    3. Enforce CPL (Chars Per Line), CPS (Chars Per Second), and duration constraints.
-    """
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if a == b:
+        return 1.0
+    return len(a & b) / len(a | b)
 
-    # 1. Merge broken sentences
-    merged = []
+
+def _merge_broken_sentences(
+    segments: List[Dict[str, Any]], max_duration: float
+) -> List[Dict[str, Any]]:
+    merged: List[Dict[str, Any]] = []
     for seg in segments:
         if merged:
             A = merged[-1]
-            gap = max(0.0, seg["start"] - A["end"])
-            A_text, B_text = A["text"].strip(), seg["text"].strip()
+            A_text = A["text"].strip()
 
             # Heuristic: Merge if A doesn't end with punctuation AND
-            # (B starts with small word OR A is very short) AND gap is small
-            if (
-                not _PUNCT_END.search(A_text)
-                and (_SMALL_WORD.match(B_text) or len(A_text.split()) <= 3)
-                and gap < 0.5
-            ):
-                new_text = (A_text + " " + B_text).strip()
-                new_dur = seg["end"] - A["start"]
-                # Only merge if resulting segment isn't too fast or too long
-                if new_dur <= max_duration and _cps(new_text, new_dur) <= 17.0:
-                    A["text"] = new_text
-                    A["end"] = seg["end"]
-                    continue
-        merged.append({"start": seg["start"], "end": seg["end"], "text": seg["text"]})
+            # (B starts with small word OR A is very short) AND gap is small.
+            # The punctuation test is cheapest and rejects most pairs.
+            if not _PUNCT_END.search(A_text):
+                gap = max(0.0, seg["start"] - A["end"])
+                B_text = seg["text"].strip()
+                if (
+                    _starts_with_small_word(B_text) or len(A_text.split()) <= 3
+                ) and gap < 0.5:
+                    new_text = (A_text + " " + B_text).strip()
+                    new_dur = seg["end"] - A["start"]
+                    # Only merge if resulting segment isn't too fast or too long
+                    # len(new_text) bounds the CPS char count, so the exact
+                    # count is only needed when the cheap bound is too high
+                    if new_dur <= max_duration and (
+                        len(new_text) <= 17.0 * new_dur
+                        or _cps(new_text, new_dur) <= 17.0
+                    ):
+                        A["text"] = new_text
+                        A["end"] = seg["end"]
+                        continue
+        merged.append(seg)
+    return merged
 
-    # 2. Dedupe near-duplicates within 1s window (Fixes Whisper hallucinations)
-    deduped = []
+
+def _dedupe_segments(
+    merged: List[Dict[str, Any]], char_dedupe: bool
+) -> List[Dict[str, Any]]:
+    if len(merged) < 2:
+        return merged
+
+    norms = [_norm_text(s["text"]) for s in merged]
+    token_sets: List[FrozenSet[str]] = (
+        [] if char_dedupe else [frozenset(n.split()) for n in norms]
+    )
+    deduped: List[Dict[str, Any]] = []
     i = 0
     while i < len(merged):
         cur = merged[i]
-        cur_norm = _norm_text(cur["text"])
+        cur_norm = norms[i]
+        cur_tokens: FrozenSet[str] = frozenset() if char_dedupe else token_sets[i]
         j = i + 1
         while j < len(merged):
             nxt = merged[j]
             # If segments are too far apart, stop checking for duplicates
             if nxt["start"] - cur["end"] > 1.0:
                 break
-            nxt_norm = _norm_text(nxt["text"])
+            nxt_norm = norms[j]
 
             # If >90% similar, keep the longer one (or merge time range)
-            if _similarity(cur_norm, nxt_norm) >= 0.9:
-                keep_text = (
-                    cur["text"] if len(cur_norm) >= len(nxt_norm) else nxt["text"]
-                )
-                cur["text"] = keep_text
+            if char_dedupe:
+                similar = _similarity(cur_norm, nxt_norm, 0.9) >= 0.9
+            else:
+                similar = _jaccard(cur_tokens, token_sets[j]) >= 0.9
+            if similar:
+                if len(cur_norm) < len(nxt_norm):
+                    cur["text"] = nxt["text"]
+                    norms[i] = cur_norm = nxt_norm
+                    if not char_dedupe:
+                        token_sets[i] = cur_tokens = token_sets[j]
                 cur["end"] = max(cur["end"], nxt["end"])
                 j += 1
             else:
                 break
         deduped.append(cur)
         i = j
+    return deduped
+
+
+def post_process_segments(
+    segments: List[Dict[str, Any]],
+    grammar_style: bool = False,
+    max_chars_per_line: int = 42,
+    min_duration: float = 1.0,
+    max_duration: float = 6.0,
+    char_dedupe: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Apply advanced post-processing to subtitles:
+    1. Merge broken sentences.
+    2. Dedupe near-duplicates (token-set overlap, or character similarity
+       when char_dedupe is set).
+    3. Enforce CPL (Chars Per Line), CPS (Chars Per Second), and duration constraints.
+
+    The input segment dicts are reused and modified in place.
+    """
+
+    # 1. Merge broken sentences
+    # 2. Dedupe near-duplicates within 1s window (Fixes Whisper hallucinations)
+    # Neither stage can change anything with fewer than two segments
+    if len(segments) < 2:
+        deduped = list(segments)
+    else:
+        merged = _merge_broken_sentences(segments, max_duration)
+        deduped = _dedupe_segments(merged, char_dedupe)
 
     # 3. Enforce limits: 2 lines, Max CPL, Duration Clamping
-    final = []
+    final: List[Dict[str, Any]] = []
     sentence_end = True
     for seg in deduped:
         text = seg["text"]
         dur = seg["end"] - seg["start"]
 
-        t = (
-            _light_grammar(text, prev_ended_sentence=sentence_end)
+        words = (
+            _light_grammar_tokens(text, prev_ended_sentence=sentence_end)
             if grammar_style
-            else text.strip()
-        )
-        sentence_end = bool(_PUNCT_END.search(t))
-
-        # Line Splitting
-        words = t.split()
-        line1, line2 = [], []
-        for w in words:
-            if len(" ".join(line1 + [w])) <= max_chars_per_line:
-                line1.append(w)
-            else:
-                line2.append(w)
-        wrapped = (
-            " ".join(line1) if not line2 else " ".join(line1) + "\n" + " ".join(line2)
+            else text.split()
         )
+        sentence_end = bool(words) and bool(_PUNCT_END.search(words[-1]))
 
-        # Smart Split: If fast CPS and long duration, split into two segments
-        if _cps(t, dur) > 17.0 and dur >= 3.0 and len(words) >= 6:
+        # Smart Split: If fast CPS and long duration, split into two segments.
+        # len(text) is an upper bound on the CPS char count, so most segments
+        # are rejected before the exact count is taken.
+        if (
+            dur >= 3.0
+            and len(words) >= 6
+            and len(text) > 17.0 * dur
+            and sum(len(w) for w in words) > 17.0 * dur
+        ):
             mid = seg["start"] + dur / 2
             half = len(words) // 2
             t1 = " ".join(words[:half]).strip()
@@ -158,13 +252,33 @@ def post_process_segments(
                 final.append({"start": seg["start"], "end": mid, "text": t1})
             if t2:
                 final.append({"start": mid, "end": seg["end"], "text": t2})
-        else:
-            # Duration Clamping
-            if dur < min_duration:
-                seg["end"] = seg["start"] + min_duration
-            elif dur > max_duration:
-                seg["end"] = seg["start"] + max_duration
-
-            final.append({"start": seg["start"], "end": seg["end"], "text": wrapped})
+            continue
+
+        # Line Splitting (most segments already fit on one line)
+        wrapped = " ".join(words)
+        if len(wrapped) > max_chars_per_line:
+            line1: List[str] = []
+            line2: List[str] = []
+            used = 0
+            for w in words:
+                extra = len(w) + (1 if line1 else 0)
+                if not line2 and used + extra <= max_chars_per_line:
+                    line1.append(w)
+                    used += extra
+                else:
+                    line2.append(w)
+            wrapped = (
+                " ".join(line1)
+                if not line2
+                else " ".join(line1) + "\n" + " ".join(line2)
+            )
+
+        # Duration Clamping
+        if dur < min_duration:
+            seg["end"] = seg["start"] + min_duration
+        elif dur > max_duration:
+            seg["end"] = seg["start"] + max_duration
+
+        final.append({"start": seg["start"], "end": seg["end"], "text": wrapped})
 
     return final
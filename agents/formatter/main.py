@@ -1,6 +1,6 @@
 from mcp.server.fastmcp import FastMCP
 from typing import List, Dict, Any, Literal
-from formatting import post_process_segments, format_timestamp, format_timestamp_vtt
+from formatting import post_process_segments, iter_format_subtitles
 import logging
 
 # Initialize FastMCP server
@@ -19,6 +19,7 @@ def format_subtitles(
     max_chars_per_line: int = 42,
     min_duration: float = 1.0,
     max_duration: float = 6.0,
+    char_dedupe: bool = False,
 ) -> str:
     """
     Format raw transcription segments into SRT, VTT, or TXT.
@@ -30,6 +31,7 @@ def format_subtitles(
         max_chars_per_line: Maximum characters per line (default 42).
         min_duration: Minimum duration for a segment in seconds.
         max_duration: Maximum duration for a segment in seconds.
+        char_dedupe: Dedupe by character similarity instead of word overlap.
     """
     try:
         logger.info(f"Formatting {len(segments)} segments to {format.upper()}")
@@ -41,30 +43,11 @@ def format_subtitles(
             max_chars_per_line=max_chars_per_line,
             min_duration=min_duration,
             max_duration=max_duration,
+            char_dedupe=char_dedupe,
         )
 
         # 2. Generate Output String
-        output = ""
-
-        if format == "srt":
-            for i, seg in enumerate(processed, 1):
-                start = format_timestamp(seg["start"])
-                end = format_timestamp(seg["end"])
-                text = seg["text"].strip()
-                output += f"{i}\n{start} --> {end}\n{text}\n\n"
-
-        elif format == "vtt":
-            output = "WEBVTT\n\n"
-            for seg in processed:
-                start = format_timestamp_vtt(seg["start"])
-                end = format_timestamp_vtt(seg["end"])
-                text = seg["text"].strip()
-                output += f"{start} --> {end}\n{text}\n\n"
-
-        else:  # txt
-            output = "\n".join([s["text"].strip() for s in processed])
-
-        return output
+        return "".join(iter_format_subtitles(processed, format))
 
     except Exception as e:
         logger.error(f"Formatting failed: {e}")
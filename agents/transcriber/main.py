@@ -3,7 +3,8 @@ from faster_whisper import WhisperModel
 import time
 import sys
 import logging
-from typing import Optional, Literal
+from functools import lru_cache
+from typing import Optional, Literal, Tuple
 from utils import get_device_and_compute_type, get_app_models_dir
 
 # Initialize FastMCP server
@@ -14,12 +15,43 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=2)
+def _load_model(
+    model: str, device: str, compute_type: str, cpu_threads: int, models_dir: str
+) -> WhisperModel:
+    """Load a WhisperModel, reusing it across calls with the same settings."""
+    return WhisperModel(
+        model,
+        device=device,
+        compute_type=compute_type,
+        download_root=models_dir,
+        cpu_threads=cpu_threads,
+    )
+
+
+@lru_cache(maxsize=32)
+def _parse_temps(temperature_schedule: str) -> Tuple[float, ...]:
+    """Parse a comma-separated temperature schedule, defaulting to (0.0,)."""
+    try:
+        temps = tuple(float(t) for t in temperature_schedule.split(",") if t.strip())
+    except ValueError:
+        temps = ()
+    return temps or (0.0,)
+
+
 @mcp.tool()
 def ping() -> str:
     """Ping the agent to check connectivity."""
     return "pong"
 
 
+@mcp.tool()
+def unload_models() -> str:
+    """Release all cached Whisper models."""
+    _load_model.cache_clear()
+    return "unloaded"
+
+
 @mcp.tool()
 def transcribe_audio(
     audio_path: str,
@@ -37,6 +69,7 @@ def transcribe_audio(
     condition_on_previous_text: bool = False,
     num_workers: int = 4,
     cpu_threads: int = 4,
+    compute_type: Optional[str] = None,
 ) -> dict:
     """
     Transcribe audio using Faster Whisper.
@@ -56,6 +89,8 @@ def transcribe_audio(
         condition_on_previous_text: Condition on previous text.
         num_workers: Number of workers.
         cpu_threads: Number of CPU threads.
+        compute_type: Force a compute type (e.g. float16, int8) instead of the
+            device-based default order.
     """
 
     ctx.info(f"Starting transcription for: {audio_path}")
@@ -64,7 +99,9 @@ def transcribe_audio(
     start_time = time.time()
 
     # 1. Device & Compute Type Selection
-    device, compute_candidates = get_device_and_compute_type()
+    device, compute_candidates = get_device_and_compute_type(
+        preferred_compute=compute_type
+    )
     ctx.info(f"Device: {device} | Candidates: {compute_candidates}")
 
     # 2. Model Loading with Fallbacks
@@ -75,12 +112,8 @@ def transcribe_audio(
     ctx.info("Loading model...")
     for candidate in compute_candidates:
         try:
-            whisper_model = WhisperModel(
-                model,
-                device=device,
-                compute_type=candidate,
-                download_root=models_dir,
-                cpu_threads=cpu_threads,
+            whisper_model = _load_model(
+                model, device, candidate, cpu_threads, models_dir
             )
             final_compute_type = candidate
             ctx.info(f"Model loaded with compute_type={candidate}")
@@ -91,11 +124,8 @@ def transcribe_audio(
     if whisper_model is None:
         ctx.warning("Falling back to implicit compute_type...")
         try:
-            whisper_model = WhisperModel(
-                model,
-                device=device,
-                download_root=models_dir,
-                cpu_threads=cpu_threads,
+            whisper_model = _load_model(
+                model, device, "default", cpu_threads, models_dir
             )
             final_compute_type = getattr(whisper_model, "compute_type", "unknown")
             ctx.info(f"Model loaded with implicit compute_type={final_compute_type}")
@@ -105,12 +135,7 @@ def transcribe_audio(
 
     # 3. Parameters & Profile Logic
     # Parse temperature schedule
-    try:
-        temps = [float(t) for t in temperature_schedule.split(",") if t.strip()]
-    except ValueError:
-        temps = [0.0]
-    if not temps:
-        temps = [0.0]
+    temps = _parse_temps(temperature_schedule)
 
     transcribe_kwargs = {
         "task": task,
@@ -190,6 +215,9 @@ def transcribe_audio(
 
         all_segments = []
         duration = getattr(info, "duration", 0.0)
+        # Throttle progress messages: each one is a round-trip over the MCP transport
+        last_report_t = 0.0
+        last_percent = -1
 
         for segment in segments_iter:
             # Check cancellation (MCP doesn't have native cancellation token yet,
@@ -207,10 +235,17 @@ def transcribe_audio(
             # Progress Logging
             if duration > 0:
                 percent = int((segment.end / duration) * 100)
-                ctx.report_progress(segment.end, duration)
-                ctx.info(
-                    f"Progress: {percent}% | {segment.start:.1f}s -> {segment.end:.1f}s"
-                )
+                now = time.time()
+                if percent != last_percent and now - last_report_t > 0.5:
+                    last_percent, last_report_t = percent, now
+                    ctx.report_progress(segment.end, duration)
+                    ctx.info(
+                        f"Progress: {percent}% | {segment.start:.1f}s -> {segment.end:.1f}s"
+                    )
+
+        if duration > 0 and last_percent != 100:
+            ctx.report_progress(duration, duration)
+            ctx.info("Progress: 100%")
 
         total_time = time.time() - start_time
         ctx.info(f"Transcription complete in {total_time:.2f}s")
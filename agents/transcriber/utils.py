@@ -10,28 +10,57 @@ def get_device_and_compute_type(
     """Select device and an ordered list of compute_type fallbacks.
 
     On macOS we prefer running under CPU so that PyTorch can use MPS where
-    available. We attempt compute types in order: float16 -> int8_float16 -> int8.
-    The caller should try each compute_type when loading the model and fall
-    back on failure.
+    available. Elsewhere we use CUDA when CTranslate2 can see a GPU, otherwise
+    CPU. On CUDA we try float16 -> int8_float16 -> int8; on CPU float16 is
+    usually emulated, so int8 comes first (faster decode at the cost of a
+    slight WER regression). Pass preferred_compute to override.
+    Candidates the device doesn't support (per CTranslate2) are dropped up
+    front. The caller should try each compute_type when loading the model and
+    fall back on failure.
     """
     # Device preference: allow override but default to 'cpu' on macOS so MPS
-    # path can be used by PyTorch; otherwise prefer 'auto'.
+    # path can be used by PyTorch; otherwise use CUDA if a GPU is visible.
     if preferred_device:
         device = preferred_device
+    elif platform.system() == "Darwin":
+        device = "cpu"
     else:
-        if platform.system() == "Darwin":
-            device = "cpu"
-        else:
-            device = "auto"
+        device = "cuda" if _has_cuda() else "cpu"
 
     # Candidate compute types to try in order (most performant first)
     # Note: CTranslate2/faster-whisper supports: float16, int8_float16, int8
     if preferred_compute:
         compute_candidates = [preferred_compute]
+    elif device == "cpu":
+        compute_candidates = ["int8", "int8_float16", "float16"]
     else:
         compute_candidates = ["float16", "int8_float16", "int8"]
 
-    return device, compute_candidates
+    return device, _filter_supported(device, compute_candidates)
+
+
+def _has_cuda() -> bool:
+    try:
+        import ctranslate2
+
+        return ctranslate2.get_cuda_device_count() > 0
+    except Exception:
+        return False
+
+
+def _filter_supported(device: str, candidates: List[str]) -> List[str]:
+    """Drop compute types CTranslate2 reports as unsupported on device.
+
+    Returns the candidates unchanged if the probe itself fails (e.g. older
+    ctranslate2 or device="auto").
+    """
+    try:
+        import ctranslate2
+
+        supported = ctranslate2.get_supported_compute_types(device)
+    except Exception:
+        return candidates
+    return [c for c in candidates if c in supported]
 
 
 def get_app_models_dir() -> str: